@@ -32,6 +32,13 @@ Environment variables:
   AMI_PORT       – Port of the AMI (defaults to 5038).
   AMI_USER       – AMI username with originate permissions.
   AMI_PASS       – AMI password.
+  AMI_PING_INTERVAL – Seconds between keepalive pings on the pooled AMI
+                   connection (defaults to 20).
+  ALERT_QUEUE_SIZE – Maximum number of high‑priority alerts waiting to be
+                   dialled (defaults to 64); further alerts are dropped.
+  COALESCE_MS    – Minimum interval between SIP calls in milliseconds
+                   (defaults to 5000). Alerts inside the window still trigger
+                   the webhook but do not place another call. 0 disables.
 
   CHANNEL_TECH   – Channel technology (e.g. PJSIP or SIP).
   DIAL_STRING    – Dial string used to originate the call; defaults to
@@ -43,26 +50,40 @@ Environment variables:
 
   LOG_LEVEL      – Logging level (INFO by default).
 
-When the script detects a high‑priority alert, it connects to the AMI,
-authenticates, and issues an Originate action. It then closes the AMI
-connection. Errors during AMI connection or originate are logged but do not
-crash the subscriber loop.
+When the script detects a high‑priority alert, it issues an Originate action
+over a single long‑lived, authenticated AMI connection. The connection is
+opened lazily on the first alert, kept alive with periodic pings, and
+re‑established on the next alert after any failure. An Originate whose
+reply is lost is retried once on a fresh connection; one the AMI rejects is
+logged and not retried. Errors during AMI connection or originate are logged
+but do not crash the subscriber loop.
 """
 
 import asyncio
-import json
+import base64
 import logging
 import os
+import random
 import socket
+from collections import deque
+from collections.abc import AsyncIterator, Callable
 from contextlib import asynccontextmanager
 
 import aiohttp
 
+# orjson is markedly faster at decoding the SSE payloads; fall back to the
+# standard library when it is not installed.
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
 # ---------------------------------------------------------------------------
 # Configuration via environment variables with sane defaults
 NTFY_URL = os.getenv("NTFY_URL", "https://ntfy.sh")
 NTFY_TOPIC = os.getenv("NTFY_TOPIC", "alerts")
 NTFY_AUTH = os.getenv("NTFY_AUTH", "")
+SSE_URL = f"{NTFY_URL.rstrip('/')}/{NTFY_TOPIC}/sse"
 
 # Optional HTTP webhook components for external notifications. If all are set,
 # the bridge will POST the full ntfy message as JSON to:
@@ -78,6 +99,9 @@ AMI_HOST = os.getenv("AMI_HOST", "pbx")
 AMI_PORT = int(os.getenv("AMI_PORT", "5038"))
 AMI_USER = os.getenv("AMI_USER", "ntfybridge")
 AMI_PASS = os.getenv("AMI_PASS", "secret")
+AMI_PING_INTERVAL = float(os.getenv("AMI_PING_INTERVAL", "20"))
+ALERT_QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", "64"))
+COALESCE_MS = int(os.getenv("COALESCE_MS", "5000"))
 
 CHANNEL_TECH = os.getenv("CHANNEL_TECH", "PJSIP")
 DIAL_STRING = os.getenv("DIAL_STRING", f"{CHANNEL_TECH}/{EXTENSION}")
@@ -89,106 +113,336 @@ LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 
 logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s: %(message)s")
 
+# High-priority alerts waiting for the AMI worker, as (message, is_retry)
+# pairs. Bounded so a burst cannot grow memory without limit; the SSE reader
+# drops alerts when it is full.
+_alert_q: "asyncio.Queue[tuple[dict, bool]]" = asyncio.Queue(maxsize=ALERT_QUEUE_SIZE)
+
+# Seconds to wait for the AMI to answer an Originate or Ping.
+AMI_REPLY_TIMEOUT = 5.0
+
+# Strong references to background Originate confirmations so they are not
+# garbage collected before completion.
+_confirm_tasks: set[asyncio.Task] = set()
+
+# Event-loop time of the last Originate sent, used to coalesce bursts. Reset
+# if the AMI does not confirm that call.
+_last_originate_ts = float("-inf")
+
+# Pooled AMI connection shared by all alerts. Guarded by _ami_lock so only one
+# coroutine talks to the socket at a time.
+_ami: "AMIClient | None" = None
+_ami_lock = asyncio.Lock()
+
+# Authorization header for ntfy, encoded once since NTFY_AUTH never changes.
+_AUTH_HEADER = (
+    {"Authorization": "Basic " + base64.b64encode(NTFY_AUTH.encode()).decode()}
+    if NTFY_AUTH
+    else {}
+)
+
+# SSE field prefix for event payloads, compared by slice in the parse loop.
+_DATA_PREFIX = b"data: "
+_DATA_LEN = len(_DATA_PREFIX)
+
+# aiohttp read buffer for the ntfy stream, and the largest partial SSE event
+# buffered before the stream is treated as broken and reconnected.
+_SSE_READ_BUFSIZE = 512 * 1024
+_SSE_MAX_EVENT = 4 * _SSE_READ_BUFSIZE
+
 def _ami_line(cmd_dict: dict) -> bytes:
     """Format a dictionary of AMI key/values into CRLF-terminated bytes."""
     return ("\r\n".join(f"{k}: {v}" for k, v in cmd_dict.items()) + "\r\n\r\n").encode()
 
+# Every Originate is built from static configuration, so encode it once here
+# instead of rebuilding and re-encoding the action for each alert.
+ORIGINATE_BYTES = _ami_line({
+    "Action": "Originate",
+    "Channel": DIAL_STRING,
+    "Context": CONTEXT,
+    "Exten": EXTENSION,
+    "Priority": PRIORITY,
+    "CallerID": CALLERID,
+    "Timeout": TIMEOUT_MS,
+    "Async": "true",
+})
+PING_BYTES = _ami_line({"Action": "Ping"})
+
 class AMIClient:
-    """A minimal AMI client for issuing Originate actions."""
+    """A minimal asyncio AMI client for issuing Originate actions."""
     def __init__(self, host: str, port: int, username: str, secret: str) -> None:
         self.host = host
         self.port = port
         self.username = username
         self.secret = secret
-        self.sock: socket.socket | None = None
-    def connect(self) -> None:
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+        # One future per action awaiting a response, in send order.
+        self._waiters: deque[asyncio.Future] = deque()
+        self._reader_task: asyncio.Task | None = None
+    @property
+    def connected(self) -> bool:
+        """Whether the connection is open and the peer has not hung up."""
+        return (
+            self.writer is not None
+            and not self.writer.is_closing()
+            and self.reader is not None
+            and not self.reader.at_eof()
+        )
+    async def connect(self) -> None:
         """Connect to the AMI and log in."""
-        self.sock = socket.create_connection((self.host, self.port), timeout=10)
-        _ = self.sock.recv(4096)
-        self._send({
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout=10
+        )
+        # asyncio already enables TCP_NODELAY on TCP transports; set it here
+        # explicitly so the small AMI request/response exchange does not rely
+        # on that default.
+        sock = self.writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Discard the "Asterisk Call Manager/x.y" greeting line.
+        _ = await asyncio.wait_for(self.reader.readline(), timeout=10)
+        await self._send({
             "Action": "Login",
             "Username": self.username,
             "Secret": self.secret,
             "Events": "off",
         })
-        response = self._read_until_blank()
+        response = await self._read_until_blank()
         if b"Success" not in response:
             raise RuntimeError(f"AMI login failed: {response!r}")
-    def close(self) -> None:
-        """Send a logoff action and close the socket."""
+        # From here on responses are consumed in the background so senders
+        # never stall on a round trip they do not need.
+        self._reader_task = asyncio.create_task(self._read_responses())
+    async def close(self) -> None:
+        """Send a logoff action and close the connection."""
         try:
-            if self.sock:
-                self._send({"Action": "Logoff"})
+            if self.writer:
+                await self._send({"Action": "Logoff"})
         except Exception:
             pass
         finally:
-            if self.sock:
+            if self._reader_task:
+                self._reader_task.cancel()
+                self._reader_task = None
+            self._fail_waiters(ConnectionError("AMI connection closed"))
+            if self.writer:
+                writer = self.writer
+                self.reader = None
+                self.writer = None
+                writer.close()
                 try:
-                    self.sock.close()
-                finally:
-                    self.sock = None
-    def _send(self, cmd: dict) -> None:
-        if not self.sock:
+                    await writer.wait_closed()
+                except Exception:
+                    pass
+    async def _send(self, cmd: dict) -> None:
+        await self._send_raw(_ami_line(cmd))
+    async def _send_raw(self, data: bytes) -> None:
+        if not self.writer:
             raise RuntimeError("AMI connection not open")
-        self.sock.sendall(_ami_line(cmd))
-    def _read_until_blank(self) -> bytes:
-        if not self.sock:
+        self.writer.write(data)
+        await self.writer.drain()
+    async def _read_until_blank(self) -> bytes:
+        if not self.reader:
             raise RuntimeError("AMI connection not open")
-        chunks: list[bytes] = []
-        self.sock.settimeout(10)
-        while True:
-            data = self.sock.recv(4096)
-            if not data:
-                break
-            chunks.append(data)
-            if b"\r\n\r\n" in data:
-                break
-        return b"".join(chunks)
-    def originate_simple(self, channel: str, exten: str, context: str, priority: int,
-                          callerid: str, timeout_ms: int) -> None:
-        action = {
-            "Action": "Originate",
-            "Channel": channel,
-            "Context": context,
-            "Exten": exten,
-            "Priority": priority,
-            "CallerID": callerid,
-            "Timeout": timeout_ms,
-            "Async": "true",
-        }
-        self._send(action)
-        _ = self._read_until_blank()
+        try:
+            return await asyncio.wait_for(self.reader.readuntil(b"\r\n\r\n"), timeout=10)
+        except asyncio.IncompleteReadError as exc:
+            # Peer closed mid-response; hand back whatever did arrive.
+            return exc.partial
+    async def _read_responses(self) -> None:
+        """Background task matching AMI responses to waiters and logging them."""
+        reader = self.reader
+        try:
+            while True:
+                try:
+                    response = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    logging.warning("AMI connection closed by peer")
+                    return
+                if self._waiters:
+                    waiter = self._waiters.popleft()
+                    if not waiter.done():
+                        waiter.set_result(response)
+                else:
+                    logging.debug("Unsolicited AMI response: %r", response)
+        except Exception as exc:
+            logging.warning("AMI reader stopped: %s", exc)
+        finally:
+            self._fail_waiters(ConnectionError("AMI connection lost"))
+    def _fail_waiters(self, exc: Exception) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(exc)
+    def _check_reader(self) -> None:
+        # Once the reader has stopped nothing will resolve a new waiter, so
+        # fail fast instead of letting the caller wait out its timeout.
+        if self._reader_task is None or self._reader_task.done():
+            raise ConnectionError("AMI connection not open")
+    async def originate(self) -> asyncio.Future:
+        """Send the pre-encoded Originate action without waiting for its response.
+
+        Returns a future resolved with the reply by the background reader, or
+        failed if the connection is lost first.
+        """
+        self._check_reader()
+        reply = asyncio.get_running_loop().create_future()
+        self._waiters.append(reply)
+        await self._send_raw(ORIGINATE_BYTES)
+        return reply
+    async def ping(self) -> None:
+        """Send a Ping action; raise if the AMI does not answer successfully."""
+        self._check_reader()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        await self._send_raw(PING_BYTES)
+        response = await waiter
+        if b"Success" not in response:
+            raise RuntimeError(f"AMI ping failed: {response!r}")
+
+async def _get_ami() -> AMIClient:
+    """Return the pooled AMI client, connecting it first if needed.
+
+    The caller must hold ``_ami_lock``.
+    """
+    global _ami
+    if _ami is None or not _ami.connected:
+        await _drop_ami()
+        client = AMIClient(AMI_HOST, AMI_PORT, AMI_USER, AMI_PASS)
+        try:
+            await client.connect()
+        except BaseException:
+            # Not pooled yet, so _drop_ami() would never close it.
+            await client.close()
+            raise
+        _ami = client
+    return _ami
+
+async def _drop_ami() -> None:
+    """Close and forget the pooled AMI client so the next alert reconnects.
+
+    The caller must hold ``_ami_lock``.
+    """
+    global _ami
+    client, _ami = _ami, None
+    if client is not None:
+        try:
+            await client.close()
+        except Exception:
+            pass
+
+async def ami_keepalive() -> None:
+    """Periodically ping the pooled AMI connection to detect half-open sockets."""
+    while True:
+        await asyncio.sleep(AMI_PING_INTERVAL)
+        async with _ami_lock:
+            if _ami is None:
+                continue
+            if not _ami.connected:
+                # Already known dead; do not hold the lock waiting on a ping.
+                logging.warning("AMI connection closed; dropping it")
+                await _drop_ami()
+                continue
+            try:
+                # A half-open socket never answers; bound the whole exchange
+                # so it is dropped long before the OS would notice.
+                await asyncio.wait_for(_ami.ping(), timeout=AMI_REPLY_TIMEOUT)
+            except asyncio.TimeoutError:
+                logging.warning("AMI keepalive timed out; dropping connection")
+                await _drop_ami()
+            except Exception as exc:
+                logging.warning("AMI keepalive failed: %s; dropping connection", exc)
+                await _drop_ami()
 
 @asynccontextmanager
 async def ntfy_session():
-    """Create an aiohttp ClientSession with optional basic auth."""
-    headers = {}
-    if NTFY_AUTH:
-        import base64
-        headers["Authorization"] = "Basic " + base64.b64encode(NTFY_AUTH.encode()).decode()
-    async with aiohttp.ClientSession(headers=headers) as session:
+    """
+    Create the long-lived aiohttp ClientSession used for the ntfy subscription.
+
+    The session is shared across reconnects so its connector keeps the DNS
+    cache and any idle keep-alive connection instead of paying for fresh
+    lookups and TLS handshakes after every dropped stream.
+    """
+    connector = aiohttp.TCPConnector(keepalive_timeout=60, ttl_dns_cache=300, limit=4)
+    # ntfy events carrying attachments or long alert bodies can exceed aiohttp's
+    # 64 KiB default read buffer; size it so such events arrive in one read.
+    async with aiohttp.ClientSession(
+        connector=connector, headers=_AUTH_HEADER, read_bufsize=_SSE_READ_BUFSIZE
+    ) as session:
         yield session
 
-async def subscribe_ntfy() -> None:
-    sse_url = f"{NTFY_URL.rstrip('/')}/{NTFY_TOPIC}/sse"
-    logging.info(f"Subscribing to ntfy SSE: {sse_url}")
-    async with ntfy_session() as session:
-        async with session.get(sse_url, timeout=None) as resp:
-            resp.raise_for_status()
-            async for line in resp.content:
-                try:
-                    decoded = line.decode("utf-8", "ignore").strip()
-                except Exception:
-                    continue
-                if not decoded.startswith("data: "):
-                    continue
-                payload = decoded[6:]
-                try:
-                    msg = json.loads(payload)
-                except json.JSONDecodeError:
-                    logging.debug(f"Ignoring non‑JSON payload: {payload[:120]}")
-                    continue
-                await handle_ntfy_msg(msg)
+async def _iter_sse_data(content: aiohttp.StreamReader) -> AsyncIterator[bytes]:
+    """
+    Yield the data payload of each complete SSE event read from ``content``.
+
+    Whole network chunks are read into a single buffer and every event they
+    contain is framed in one pass, rather than going through aiohttp's
+    per-line splitter. Lines other than ``data:`` fields are skipped without
+    being decoded.
+    """
+    buf = bytearray()
+    carry_cr = False
+    while True:
+        chunk = await content.readany()
+        if not chunk:
+            return
+        # Hold back a trailing CR so a CRLF split across reads still folds to LF.
+        if carry_cr:
+            chunk = b"\r" + chunk
+        carry_cr = chunk.endswith(b"\r")
+        if carry_cr:
+            chunk = chunk[:-1]
+        # Only the newly appended bytes (plus one for a boundary straddling the
+        # previous read) can complete an event, so scan just that suffix
+        # instead of re-splitting a large partial event on every read.
+        start = max(len(buf) - 1, 0)
+        buf += chunk.replace(b"\r\n", b"\n")
+        if buf.find(b"\n\n", start) < 0:
+            # Without this cap a stream that never sends a blank line would
+            # grow the buffer without bound.
+            if len(buf) > _SSE_MAX_EVENT:
+                raise aiohttp.ClientPayloadError(
+                    f"SSE event exceeds {_SSE_MAX_EVENT} bytes without a terminator"
+                )
+            continue
+        *events, tail = buf.split(b"\n\n")
+        del buf[:len(buf) - len(tail)]
+        for event in events:
+            data = [
+                line[_DATA_LEN:]
+                for line in event.split(b"\n")
+                if line[:_DATA_LEN] == _DATA_PREFIX
+            ]
+            if data:
+                yield b"\n".join(data)
+
+async def subscribe_ntfy(session: aiohttp.ClientSession,
+                         on_connect: Callable[[], None] | None = None) -> None:
+    """
+    Stream the ntfy topic and dispatch each message until the connection ends.
+
+    ``on_connect`` is called once the first event arrives, i.e. when the
+    subscription is known to be healthy.
+    """
+    logging.info("Subscribing to ntfy SSE: %s", SSE_URL)
+    async with session.get(SSE_URL, timeout=None) as resp:
+        resp.raise_for_status()
+        async for payload in _iter_sse_data(resp.content):
+            if on_connect is not None:
+                on_connect()
+                on_connect = None
+            try:
+                msg = _json.loads(payload)
+            except ValueError:
+                # Covers both JSONDecodeError flavours and the UnicodeDecodeError
+                # the stdlib parser raises on invalid UTF-8.
+                logging.debug("Ignoring non‑JSON payload: %r", payload[:120])
+                continue
+            handle_ntfy_msg(msg)
+            # Buffered events are parsed without suspending, so yield here to
+            # let the alert worker dial between back-to-back messages.
+            await asyncio.sleep(0)
 
 async def send_webhook(msg: dict) -> None:
     """
@@ -206,45 +460,146 @@ async def send_webhook(msg: dict) -> None:
             logging.info("Webhook notification sent")
     except Exception as exc:
         # Log and ignore webhook errors; they should not disrupt SIP calling.
-        logging.exception(f"Webhook send failed: {exc}")
+        logging.exception("Webhook send failed: %s", exc)
 
-async def handle_ntfy_msg(msg: dict) -> None:
+def handle_ntfy_msg(msg: dict) -> None:
+    """Log an ntfy message and queue it for the AMI worker if it is high priority."""
     prio = int(msg.get("priority", 3))
     title = msg.get("title", "")
     body = msg.get("message", "")
-    logging.info(f"ntfy message: priority={prio} title={title!r} message={body!r}")
+    logging.info("ntfy message: priority=%s title=%r message=%r", prio, title, body)
     if prio >= 4:
-        logging.info("High priority detected; sending webhook and placing SIP call...")
+        # Never block the SSE reader on a slow AMI; shed load instead.
+        try:
+            _alert_q.put_nowait((msg, False))
+        except asyncio.QueueFull:
+            logging.warning("Alert queue full (%d); dropping alert %r", ALERT_QUEUE_SIZE, title)
+
+def _retry_alert(msg: dict, retry: bool) -> None:
+    """Queue a failed alert for one more call attempt, unless it was already retried."""
+    title = msg.get("title", "")
+    if retry:
+        logging.error("SIP call for alert %r failed after retry; giving up", title)
+        return
+    try:
+        _alert_q.put_nowait((msg, True))
+    except asyncio.QueueFull:
+        logging.error("Alert queue full (%d); cannot retry alert %r", ALERT_QUEUE_SIZE, title)
+
+async def _confirm_originate(ami: AMIClient, reply: asyncio.Future, msg: dict,
+                             retry: bool, sent_at: float) -> None:
+    """
+    Wait for the Originate reply off the hot path.
+
+    A lost reply (timeout or dropped connection) reconnects and retries the
+    alert once. An explicit rejection is only logged: the AMI received the
+    action, and retrying would just be rejected again.
+    """
+    global _last_originate_ts
+    try:
+        response = await asyncio.wait_for(reply, timeout=AMI_REPLY_TIMEOUT)
+    except (asyncio.TimeoutError, ConnectionError) as exc:
+        logging.error("AMI originate not confirmed: %r; dropping connection", exc)
+        # The call was never placed, so it must not suppress the next alert.
+        if _last_originate_ts == sent_at:
+            _last_originate_ts = float("-inf")
+        async with _ami_lock:
+            # Only drop the connection the failed Originate went out on.
+            if _ami is ami:
+                await _drop_ami()
+        _retry_alert(msg, retry)
+        return
+    if b"Success" not in response:
+        logging.error("AMI rejected originate for alert %r: %r", msg.get("title", ""), response)
+        if _last_originate_ts == sent_at:
+            _last_originate_ts = float("-inf")
+        return
+    logging.info("Originate accepted by AMI.")
+
+async def process_alert(msg: dict, retry: bool = False) -> None:
+    """Send the webhook and place the SIP call for a high-priority message.
+
+    ``retry`` marks a second attempt after a failed call; the webhook has
+    already been sent for it.
+    """
+    logging.info("High priority detected; sending webhook and placing SIP call...")
+    if not retry:
         # Fire-and-forget webhook notification. Failures are logged but do not stop SIP call.
         await send_webhook(msg)
-        ami = AMIClient(AMI_HOST, AMI_PORT, AMI_USER, AMI_PASS)
+    global _last_originate_ts
+    now = asyncio.get_running_loop().time()
+    if now - _last_originate_ts < COALESCE_MS / 1000:
+        # The phone is already ringing for an earlier alert in this burst.
+        logging.info("Originate coalesced with a recent call; not dialling again.")
+        return
+    async with _ami_lock:
         try:
-            ami.connect()
-            ami.originate_simple(
-                channel=DIAL_STRING,
-                exten=EXTENSION,
-                context=CONTEXT,
-                priority=PRIORITY,
-                callerid=CALLERID,
-                timeout_ms=TIMEOUT_MS,
-            )
-            logging.info("Originate sent via AMI.")
+            ami = await _get_ami()
+            reply = await ami.originate()
+            _last_originate_ts = now
+            logging.info("Originate sent via AMI; awaiting confirmation.")
         except Exception as exc:
-            logging.exception(f"AMI originate failed: {exc}")
-        finally:
-            try:
-                ami.close()
-            except Exception:
-                pass
-async def main() -> None:
+            logging.exception("AMI originate failed: %s", exc)
+            await _drop_ami()
+            _retry_alert(msg, retry)
+            return
+    task = asyncio.create_task(_confirm_originate(ami, reply, msg, retry, now))
+    _confirm_tasks.add(task)
+    task.add_done_callback(_confirm_tasks.discard)
+
+async def alert_worker() -> None:
+    """Drain queued alerts one at a time into the pooled AMI connection."""
     while True:
+        msg, retry = await _alert_q.get()
         try:
-            await subscribe_ntfy()
-        except aiohttp.ClientError as err:
-            logging.warning(f"SSE connection error: {err}; retrying in 3 s...")
-            await asyncio.sleep(3)
-        except Exception as err:
-            logging.exception(f"Unexpected error: {err}; retrying in 5 s...")
-            await asyncio.sleep(5)
+            await process_alert(msg, retry)
+        except Exception as exc:
+            logging.exception("Alert processing failed: %s", exc)
+        finally:
+            _alert_q.task_done()
+
+async def main() -> None:
+    worker = asyncio.create_task(alert_worker())
+    keepalive = asyncio.create_task(ami_keepalive())
+    loop = asyncio.get_running_loop()
+    # Reconnect delay in seconds. Doubles on each consecutive reconnect up to a
+    # minute and is jittered so a fleet of bridges does not retry in lockstep.
+    # It only resets once a stream has stayed up for a minute, so a server
+    # that accepts and immediately closes the stream cannot cause a storm.
+    backoff = 1.0
+    connected_at: float | None = None
+    def mark_connected() -> None:
+        nonlocal connected_at
+        connected_at = loop.time()
+    def next_delay() -> float:
+        nonlocal backoff
+        if connected_at is not None and loop.time() - connected_at >= 60:
+            backoff = 1.0
+        delay = backoff * (0.5 + random.random())
+        backoff = min(backoff * 2, 60.0)
+        return delay
+    try:
+        async with ntfy_session() as session:
+            while True:
+                connected_at = None
+                try:
+                    await subscribe_ntfy(session, on_connect=mark_connected)
+                    delay = next_delay()
+                    logging.warning("SSE stream ended; reconnecting in %.1f s...", delay)
+                except aiohttp.ClientError as err:
+                    delay = next_delay()
+                    logging.warning("SSE connection error: %s; retrying in %.1f s...", err, delay)
+                except Exception as err:
+                    delay = next_delay()
+                    logging.exception("Unexpected error: %s; retrying in %.1f s...", err, delay)
+                await asyncio.sleep(delay)
+    finally:
+        background = [worker, keepalive, *_confirm_tasks]
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        # Log off the pooled AMI connection rather than leaving it to time out.
+        async with _ami_lock:
+            await _drop_ami()
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,263 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+import ntfy_to_sip  # noqa: E402
+
+ORIGINATE_OK = b'Response: Success\r\nMessage: Originate successfully queued\r\n\r\n'
+ORIGINATE_ERROR = b'Response: Error\r\nMessage: Originate failed\r\n\r\n'
+
+
+class FakeAMI:
+    """In-process AMI server that records the actions it receives."""
+
+    def __init__(self):
+        self.actions = []
+        self.originate_response = ORIGINATE_OK
+        self.hangup_on_originate = False
+        self.reject_login = False
+        self.connections = 0
+        self.disconnects = 0
+        self.writers = []
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.hangup()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def hangup(self):
+        for writer in self.writers:
+            writer.close()
+        self.writers.clear()
+
+    async def handle(self, reader, writer):
+        self.writers.append(writer)
+        self.connections += 1
+        writer.write(b'Asterisk Call Manager/5.0.1\r\n')
+        try:
+            while True:
+                data = await reader.readuntil(b'\r\n\r\n')
+                action = data.split(b'\r\n', 1)[0].partition(b': ')[2].decode()
+                self.actions.append(action)
+                if action == 'Login' and self.reject_login:
+                    writer.write(b'Response: Error\r\nMessage: Authentication failed\r\n\r\n')
+                elif action == 'Login':
+                    writer.write(b'Response: Success\r\nMessage: Authentication accepted\r\n\r\n')
+                elif action == 'Ping':
+                    writer.write(b'Response: Success\r\nPing: Pong\r\n\r\n')
+                elif action == 'Originate':
+                    if self.hangup_on_originate:
+                        break
+                    writer.write(self.originate_response)
+                elif action == 'Logoff':
+                    writer.write(b'Response: Goodbye\r\n\r\n')
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.disconnects += 1
+            writer.close()
+
+
+@pytest_asyncio.fixture
+async def ami(monkeypatch):
+    fake = FakeAMI()
+    port = await fake.start()
+    monkeypatch.setattr(ntfy_to_sip, 'AMI_HOST', '127.0.0.1')
+    monkeypatch.setattr(ntfy_to_sip, 'AMI_PORT', port)
+    monkeypatch.setattr(ntfy_to_sip, 'COALESCE_MS', 0)
+    monkeypatch.setattr(ntfy_to_sip, 'AMI_REPLY_TIMEOUT', 1.0)
+    monkeypatch.setattr(ntfy_to_sip, '_ami', None)
+    monkeypatch.setattr(ntfy_to_sip, '_ami_lock', asyncio.Lock())
+    monkeypatch.setattr(ntfy_to_sip, '_alert_q', asyncio.Queue(maxsize=4))
+    monkeypatch.setattr(ntfy_to_sip, '_last_originate_ts', float('-inf'))
+    yield fake
+    async with ntfy_to_sip._ami_lock:
+        await ntfy_to_sip._drop_ami()
+    await fake.stop()
+
+
+async def confirmations():
+    await asyncio.gather(*ntfy_to_sip._confirm_tasks)
+
+
+@pytest.mark.asyncio
+async def test_login_and_originate(ami):
+    await ntfy_to_sip.process_alert({'priority': 5})
+    await confirmations()
+    assert ami.actions == ['Login', 'Originate']
+    assert ntfy_to_sip._ami is not None and ntfy_to_sip._ami.connected
+    assert ntfy_to_sip._alert_q.empty()
+
+
+@pytest.mark.asyncio
+async def test_pooled_connection_is_reused(ami):
+    await ntfy_to_sip.process_alert({'priority': 5})
+    await ntfy_to_sip.process_alert({'priority': 5})
+    await confirmations()
+    assert ami.actions == ['Login', 'Originate', 'Originate']
+
+
+@pytest.mark.asyncio
+async def test_replies_match_actions_in_order(ami):
+    async with ntfy_to_sip._ami_lock:
+        client = await ntfy_to_sip._get_ami()
+        reply = await client.originate()
+        await client.ping()
+    response = await reply
+    assert b'Originate successfully queued' in response
+    assert b'Pong' not in response
+
+
+@pytest.mark.asyncio
+async def test_reconnects_after_peer_closes(ami):
+    await ntfy_to_sip.process_alert({'priority': 5})
+    await confirmations()
+    ami.hangup()
+    await asyncio.sleep(0.05)
+    assert not ntfy_to_sip._ami.connected
+    await ntfy_to_sip.process_alert({'priority': 5})
+    await confirmations()
+    assert ami.actions == ['Login', 'Originate', 'Login', 'Originate']
+
+
+@pytest.mark.asyncio
+async def test_lost_originate_is_retried_once(ami):
+    ami.hangup_on_originate = True
+    msg = {'priority': 5, 'title': 'lost'}
+    await ntfy_to_sip.process_alert(msg)
+    await confirmations()
+    assert ntfy_to_sip._ami is None
+    assert ntfy_to_sip._alert_q.get_nowait() == (msg, True)
+    await ntfy_to_sip.process_alert(msg, retry=True)
+    await confirmations()
+    assert ntfy_to_sip._alert_q.empty()
+
+
+@pytest.mark.asyncio
+async def test_rejected_originate_keeps_connection_and_is_not_retried(ami):
+    ami.originate_response = ORIGINATE_ERROR
+    await ntfy_to_sip.process_alert({'priority': 5, 'title': 'rejected'})
+    await confirmations()
+    assert ntfy_to_sip._ami is not None and ntfy_to_sip._ami.connected
+    assert ntfy_to_sip._alert_q.empty()
+    assert ami.actions == ['Login', 'Originate']
+
+
+@pytest.mark.asyncio
+async def test_unanswered_originate_is_retried(ami, monkeypatch):
+    monkeypatch.setattr(ntfy_to_sip, 'AMI_REPLY_TIMEOUT', 0.1)
+    ami.originate_response = b''
+    msg = {'priority': 5, 'title': 'silent'}
+    await ntfy_to_sip.process_alert(msg)
+    await confirmations()
+    assert ntfy_to_sip._ami is None
+    assert ntfy_to_sip._alert_q.get_nowait() == (msg, True)
+
+
+@pytest.mark.asyncio
+async def test_failed_originate_does_not_arm_coalescing(ami, monkeypatch):
+    monkeypatch.setattr(ntfy_to_sip, 'COALESCE_MS', 60_000)
+    ami.originate_response = ORIGINATE_ERROR
+    await ntfy_to_sip.process_alert({'priority': 5})
+    await confirmations()
+    assert ntfy_to_sip._last_originate_ts == float('-inf')
+    ami.originate_response = ORIGINATE_OK
+    await ntfy_to_sip.process_alert({'priority': 5}, retry=True)
+    await confirmations()
+    assert ami.actions.count('Originate') == 2
+    # A confirmed call keeps the window armed.
+    await ntfy_to_sip.process_alert({'priority': 5})
+    await confirmations()
+    assert ami.actions.count('Originate') == 2
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_alerts(ami):
+    msgs = [{'priority': 5, 'title': str(i)} for i in range(6)]
+    for msg in msgs:
+        ntfy_to_sip.handle_ntfy_msg(msg)
+    ntfy_to_sip.handle_ntfy_msg({'priority': 3, 'title': 'low'})
+    queued = []
+    while not ntfy_to_sip._alert_q.empty():
+        queued.append(ntfy_to_sip._alert_q.get_nowait())
+    assert queued == [(msg, False) for msg in msgs[:4]]
+
+
+@pytest.mark.asyncio
+async def test_worker_drains_queue_into_ami(ami):
+    worker = asyncio.create_task(ntfy_to_sip.alert_worker())
+    try:
+        ntfy_to_sip.handle_ntfy_msg({'priority': 4, 'title': 'a'})
+        ntfy_to_sip.handle_ntfy_msg({'priority': 5, 'title': 'b'})
+        await ntfy_to_sip._alert_q.join()
+        await confirmations()
+    finally:
+        worker.cancel()
+    assert ami.actions == ['Login', 'Originate', 'Originate']
+
+
+@pytest.mark.asyncio
+async def test_shutdown_logs_off_pooled_connection(ami, monkeypatch):
+    monkeypatch.setattr(ntfy_to_sip, 'SSE_URL', 'http://127.0.0.1:1/alerts/sse')
+    async with ntfy_to_sip._ami_lock:
+        await ntfy_to_sip._get_ami()
+    main = asyncio.create_task(ntfy_to_sip.main())
+    await asyncio.sleep(0.05)
+    main.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await main
+    await asyncio.sleep(0.05)
+    assert ntfy_to_sip._ami is None
+    assert ami.actions == ['Login', 'Logoff']
+
+
+@pytest.mark.asyncio
+async def test_failed_login_closes_connection(ami):
+    ami.reject_login = True
+    msg = {'priority': 5, 'title': 'denied'}
+    await ntfy_to_sip.process_alert(msg)
+    await asyncio.sleep(0.05)
+    assert ntfy_to_sip._ami is None
+    assert ami.connections == 1
+    assert ami.disconnects == 1
+    assert ntfy_to_sip._alert_q.get_nowait() == (msg, True)
+
+
+@pytest.mark.asyncio
+async def test_ping_fails_fast_after_peer_closes(ami):
+    async with ntfy_to_sip._ami_lock:
+        client = await ntfy_to_sip._get_ami()
+    ami.hangup()
+    await asyncio.sleep(0.05)
+    with pytest.raises(ConnectionError):
+        await asyncio.wait_for(client.ping(), timeout=0.5)
+    with pytest.raises(ConnectionError):
+        await asyncio.wait_for(client.originate(), timeout=0.5)
+
+
+@pytest.mark.asyncio
+async def test_keepalive_drops_dead_connection_without_pinging(ami, monkeypatch):
+    monkeypatch.setattr(ntfy_to_sip, 'AMI_PING_INTERVAL', 0.01)
+    async with ntfy_to_sip._ami_lock:
+        await ntfy_to_sip._get_ami()
+    ami.hangup()
+    await asyncio.sleep(0.05)
+    keepalive = asyncio.create_task(ntfy_to_sip.ami_keepalive())
+    try:
+        await asyncio.sleep(0.05)
+    finally:
+        keepalive.cancel()
+    assert ntfy_to_sip._ami is None
+    assert 'Ping' not in ami.actions
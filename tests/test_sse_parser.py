@@ -0,0 +1,89 @@
+import sys
+from pathlib import Path
+
+import aiohttp
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+import ntfy_to_sip  # noqa: E402
+
+STREAM = (
+    b': comment\r\n'
+    b'event: open\r\n'
+    b'id: 1\r\n'
+    b'data: {"event":"open"}\r\n'
+    b'\r\n'
+    b'id: 2\n'
+    b'data: {"priority":5,"title":"a"}\n'
+    b'\n'
+    b': keepalive\n'
+    b'\n'
+    b'event: message\r\n'
+    b'data: first\r\n'
+    b'data: second\r\n'
+    b'\r\n'
+    b'data: {"priority":4,"title":"b"}\r\n'
+    b'\r\n'
+    b'data: incomplete'
+)
+EXPECTED = [
+    b'{"event":"open"}',
+    b'{"priority":5,"title":"a"}',
+    b'first\nsecond',
+    b'{"priority":4,"title":"b"}',
+]
+
+
+class FakeContent:
+    """Stand-in for aiohttp's StreamReader that returns pre-split chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    async def readany(self):
+        return self.chunks.pop(0) if self.chunks else b''
+
+
+async def collect(chunks):
+    return [payload async for payload in ntfy_to_sip._iter_sse_data(FakeContent(chunks))]
+
+
+@pytest.mark.asyncio
+async def test_iter_sse_data_single_chunk():
+    assert await collect([STREAM]) == EXPECTED
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('size', range(1, 24))
+async def test_iter_sse_data_fixed_splits(size):
+    chunks = [STREAM[i:i + size] for i in range(0, len(STREAM), size)]
+    assert await collect(chunks) == EXPECTED
+
+
+@pytest.mark.asyncio
+async def test_iter_sse_data_split_at_every_offset():
+    # Two-way splits put a chunk boundary at every byte, including between the
+    # CR and LF of each CRLF.
+    for i in range(1, len(STREAM)):
+        assert await collect([STREAM[:i], STREAM[i:]]) == EXPECTED, i
+
+
+@pytest.mark.asyncio
+async def test_iter_sse_data_rejects_unterminated_oversized_event(monkeypatch):
+    monkeypatch.setattr(ntfy_to_sip, '_SSE_MAX_EVENT', 1024)
+    chunks = [b'data: {"priority":5}\n\n'] + [b'data: ' + b'x' * 200 + b'\n'] * 10
+    payloads = []
+    with pytest.raises(aiohttp.ClientPayloadError):
+        async for payload in ntfy_to_sip._iter_sse_data(FakeContent(chunks)):
+            payloads.append(payload)
+    assert payloads == [b'{"priority":5}']
+
+
+@pytest.mark.asyncio
+async def test_iter_sse_data_allows_events_up_to_the_limit(monkeypatch):
+    monkeypatch.setattr(ntfy_to_sip, '_SSE_MAX_EVENT', 1024)
+    event = b'data: ' + b'x' * 1000 + b'\n\n'
+    chunks = [event[i:i + 100] for i in range(0, len(event), 100)]
+    assert await collect(chunks) == [b'x' * 1000]